@@ -1,10 +1,15 @@
+import os
+os.environ['MPLBACKEND'] = 'Agg'  # Headless server: skip backend autodetection (set before matplotlib loads)
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
 import io
 import numpy as np
 import datetime
+import hashlib
+
+# pandas / matplotlib are imported on first use, so runs without CSV or plot data don't pay for them
+def _pd():
+    import pandas as pd
+    return pd
 
 # ---------------------------------------------------------
 # 1. Page Configuration & Aesthetics
@@ -48,6 +53,7 @@ with st.sidebar:
     
     with st.expander("📈 Plot Type & Statistics", expanded=True):
         graph_type = st.selectbox("Graph Type", ["Bar Plot (Mean)", "Box Plot (Median)", "Violin Plot (Distribution)"])
+        error_type = None
         if "Bar" in graph_type:
             error_type = st.radio("Error Bar Type", ["SD (Standard Deviation)", "SEM (Standard Error)"])
         
@@ -75,19 +81,8 @@ with st.sidebar:
         color2 = st.color_picker("Group 2 Color", "#66c2a5")
         show_legend = st.checkbox("Show Legend", value=True)
 
-    with st.expander("📏 Precise Layout (Width Linkage)", expanded=True):
-        bar_width = st.slider("Element Width (Bar/Box)", 0.1, 1.5, 0.6, 0.1)
-        bar_gap = st.slider("Group Gap", 0.0, 1.0, 0.05, 0.01)
-        cap_size = st.slider("Error Bar Capsize", 0.0, 15.0, 5.0, 0.5)
-        st.divider()
-        fig_height = st.slider("Figure Height", 3.0, 15.0, 5.0, 0.5)
-        wspace_val = st.slider("Subplot Spacing (wspace)", 0.0, 1.0, 0.1, 0.05)
-
-    with st.expander("✨ Individual Data Points (N)"):
-        show_points = st.checkbox("Overlay Data Points", value=True)
-        dot_size = st.slider("Dot Size", 1, 200, 20) 
-        dot_alpha = st.slider("Dot Alpha", 0.1, 1.0, 0.6, 0.1)
-        jitter_strength = st.slider("Jitter Strength", 0.0, 0.5, 0.04, 0.01)
+    # Layout / data-point widgets are rendered here by the plot fragment (section 4)
+    plot_style_box = st.container()
     with st.sidebar:
         st.divider()
         st.caption("【Disclaimer】")
@@ -102,19 +97,45 @@ with st.sidebar:
 # ---------------------------------------------------------
 cond_data_list = [] 
 
+@st.cache_data(max_entries=16)
+def load_csv(raw_bytes):
+    # Keyed on the file contents, so reruns don't re-parse an unchanged upload
+    return _pd().read_csv(io.BytesIO(raw_bytes), dtype={'Value': np.float32}, engine='c')
+
 # A. CSV Import (Automated)
 if uploaded_csv:
     try:
-        csv_df = pd.read_csv(uploaded_csv)
+        csv_df = load_csv(uploaded_csv.getvalue())
         if 'Group' in csv_df.columns and 'Value' in csv_df.columns:
-            for g_name in csv_df['Group'].unique():
-                g_vals = csv_df[csv_df['Group'] == g_name]['Value'].dropna().tolist()
-                cond_data_list.append({'name': g_name, 'g1': g_vals, 'g2': [], 'sig': ""})
-            st.sidebar.success(f"Imported {len(csv_df['Group'].unique())} groups from CSV")
+            # Single hash-based pass over the table instead of one boolean scan per group
+            grouped = csv_df.dropna(subset=['Value']).groupby('Group', sort=False)['Value']
+            for g_name, vals in grouped:
+                cond_data_list.append({'name': g_name, 'g1': vals.to_numpy(), 'g2': np.array([], dtype=np.float32), 'sig': ""})
+            st.sidebar.success(f"Imported {grouped.ngroups} groups from CSV")
     except Exception as e:
         st.sidebar.error(f"CSV Error: {e}")
 
+def parse_values(text):
+    # Split on commas/whitespace, then one C-side conversion; a bad token raises ValueError.
+    return np.array(text.replace(',', ' ').split(), dtype=np.float32)
+
+@st.cache_data(max_entries=64)
+def parse_all(texts):
+    # Every text area in a single conversion call, split back into fields by their token counts.
+    # Only if that fails is each field re-parsed alone, so bad fields can come back as None
+    counts = [len(t.replace(',', ' ').split()) for t in texts]
+    try:
+        return np.split(parse_values(' '.join(texts)), np.cumsum(counts)[:-1])
+    except ValueError:
+        pass
+    out = []
+    for t in texts:
+        try: out.append(parse_values(t))
+        except ValueError: out.append(None)
+    return out
+
 # B. Manual Entry (Dynamic)
+manual_entries = []
 for i in range(st.session_state.cond_count):
     with st.container():
         st.markdown("---")
@@ -136,144 +157,131 @@ for i in range(st.session_state.cond_count):
             def_v2 = "80\n75\n85\n82" if i == 0 and not uploaded_csv else ""
             input2 = st.text_area(f"Data 2", value=def_v2, height=100, key=f"d2_{i}", label_visibility="collapsed")
 
-        # Parsing with robustness
-        v1, v2 = [], []
-        if input1:
-            try: v1 = [float(x.strip()) for x in input1.replace(',', '\n').split('\n') if x.strip()]
-            except: st.error(f"Format error in {cond_name} - {group1_name}")
-        if input2:
-            try: v2 = [float(x.strip()) for x in input2.replace(',', '\n').split('\n') if x.strip()]
-            except: st.error(f"Format error in {cond_name} - {group2_name}")
-        
-        if v1 or v2:
-            cond_data_list.append({'name': cond_name, 'g1': v1, 'g2': v2, 'sig': sig_label})
+        manual_entries.append((cond_name, sig_label, input1, input2, st.container()))  # container: slot for format errors
+
+# Parsing with robustness (all conditions at once)
+parsed = parse_all(tuple(t for _, _, input1, input2, _ in manual_entries for t in (input1, input2)))
+for k, (cond_name, sig_label, _, _, msg_box) in enumerate(manual_entries):
+    v1, v2 = parsed[2 * k], parsed[2 * k + 1]
+    if v1 is None: v1 = parse_values(""); msg_box.error(f"Format error in {cond_name} - {group1_name}")
+    if v2 is None: v2 = parse_values(""); msg_box.error(f"Format error in {cond_name} - {group2_name}")
+
+    if len(v1) or len(v2):
+        cond_data_list.append({'name': cond_name, 'g1': v1, 'g2': v2, 'sig': sig_label})
 
 # ---------------------------------------------------------
 # 4. Final Graph Visualization Module
 # ---------------------------------------------------------
-if cond_data_list:
+PREVIEW_DPI = 100  # On-screen preview; the 300 DPI export is only rendered on request
+EXPORT_DPI = 300
+
+def get_fig(n, fig_height, reuse=True):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.patches import Patch
+    import plot_engine
+    # One Agg Figure per session (reuse=False: throwaway Figure for the export)
+    fig = st.session_state.get('_fig') if reuse else None
+    if fig is None:
+        fig = Figure(layout='constrained')
+        fig.get_layout_engine().set(w_pad=0, wspace=0)  # flush panels
+        FigureCanvasAgg(fig)
+        # Legend handles, restyled in place by render()
+        patches = (Patch(edgecolor='black'), Patch(edgecolor='black'))
+        if reuse: st.session_state['_fig'], st.session_state['_legend_patches'] = fig, patches
+    else:
+        patches = st.session_state['_legend_patches']
+    plot_engine.size_canvas(fig, n, fig_height)  # render() widens it for the legend
+    if len(fig.axes) != n:
+        fig.clf()
+        axes = list(fig.subplots(1, n, sharey=True, squeeze=False)[0])
+    else:
+        axes = fig.axes
+        for ax in axes: ax.cla()
+        for lg in list(fig.legends): lg.remove()
+    return fig, axes, patches
+
+@st.cache_data(max_entries=32)
+def build_figure(data, style, seed, dpi):
+    import plot_engine
+    fig, axes, patches = get_fig(len(data), style['fig_height'], reuse=dpi == PREVIEW_DPI)
+    plot_engine.render(fig, axes, data, style, seed, legend_handles=patches)
+
+    # Fast zlib for the preview, default compression for the export
+    pil_kwargs = {'compress_level': 1, 'optimize': False} if dpi == PREVIEW_DPI else None
+    img_buf = io.BytesIO()
+    fig.savefig(img_buf, format='png', dpi=dpi, pil_kwargs=pil_kwargs)
+    return img_buf.getvalue()
+
+@st.fragment
+def render_section(cond_data_list, style):
+    # Plot-only widgets (changing them reruns just this fragment)
+    with plot_style_box:
+        with st.expander("📏 Precise Layout (Width Linkage)", expanded=True):
+            bar_width = st.slider("Element Width (Bar/Box)", 0.1, 1.5, 0.6, 0.1)
+            bar_gap = st.slider("Group Gap", 0.0, 1.0, 0.05, 0.01)
+            cap_size = st.slider("Error Bar Capsize", 0.0, 15.0, 5.0, 0.5)
+            st.divider()
+            fig_height = st.slider("Figure Height", 3.0, 15.0, 5.0, 0.5)
+            wspace_val = st.slider("Subplot Spacing (wspace)", 0.0, 1.0, 0.1, 0.05)
+
+        with st.expander("✨ Individual Data Points (N)"):
+            show_points = st.checkbox("Overlay Data Points", value=True)
+            dot_size = st.slider("Dot Size", 1, 200, 20) 
+            dot_alpha = st.slider("Dot Alpha", 0.1, 1.0, 0.6, 0.1)
+            jitter_strength = st.slider("Jitter Strength", 0.0, 0.5, 0.04, 0.01)
+
+    if not cond_data_list:
+        st.info("Awaiting input: Please upload a CSV or enter data manually to generate the figure.")
+        return
+
     st.subheader("Final Preview")
+    c_auto, c_render = st.columns([3, 1])
+    auto_update = c_auto.toggle("Auto-update preview", value=True, key="auto_update",
+                                help="Turn off to adjust several settings, then render once.")
+    render_now = c_render.button("🔄 Render Preview")
+    # Per-session jitter seed
+    if '_rng_seed' not in st.session_state:
+        st.session_state._rng_seed = 42
+    seed = st.session_state._rng_seed
     try:
-        n_plots = len(cond_data_list)
-        # Dynamic Width Calculation based on Condition count
-        fig, axes = plt.subplots(1, n_plots, figsize=(n_plots * 3.5, fig_height), sharey=True)
-        if n_plots == 1: axes = [axes]
-        
-        plt.subplots_adjust(wspace=0)
-        plt.rcParams['font.family'] = 'sans-serif'
-        fig.suptitle(fig_title, fontsize=16, y=1.05)
-
-        # Global scale calculation
-        all_vals = []
-        has_any_g1, has_any_g2 = False, False
-        for d in cond_data_list:
-            all_vals.extend(d['g1'] + d['g2'])
-            if d['g1']: has_any_g1 = True
-            if d['g2']: has_any_g2 = True
-        
-        y_max_limit = manual_y_max if manual_y_max > 0 else (max(all_vals) * 1.35 if all_vals else 100)
-
-        # Rendering Loop
-        for i, ax in enumerate(axes):
-            data = cond_data_list[i]
-            g1, g2 = np.array(data['g1']), np.array(data['g2'])
-            h_g1, h_g2 = len(g1) > 0, len(g2) > 0
-            
-            # Linking element_width and bar_gap to coordinate mapping
-            pos1, pos2 = (-(bar_width/2 + bar_gap/2), +(bar_width/2 + bar_gap/2)) if h_g1 and h_g2 else (0, 0)
-
-            def plot_core_internal(ax, pos, vals, color):
-                if len(vals) == 0: return
-                
-                mean_v = np.mean(vals)
-                std_v = np.std(vals, ddof=1) if len(vals) > 1 else 0
-                
-                # Statistics Branching
-                if "Bar" in graph_type and "SEM" in error_type:
-                    err_v = std_v / np.sqrt(len(vals))
-                else:
-                    err_v = std_v
-
-                # Geometry Branching
-                if "Bar" in graph_type:
-                    ax.bar(pos, mean_v, width=bar_width, color=color, edgecolor='black', linewidth=1.2, zorder=1)
-                    ax.errorbar(pos, mean_v, yerr=err_v, fmt='none', color='black', capsize=cap_size, elinewidth=1.5, zorder=2)
-                elif "Box" in graph_type:
-                    ax.boxplot(vals, positions=[pos], widths=bar_width, patch_artist=True, showfliers=False,
-                               boxprops=dict(facecolor=color, color='black', linewidth=1.2),
-                               medianprops=dict(color='black', linewidth=1.5),
-                               whiskerprops=dict(linewidth=1.2), capprops=dict(linewidth=1.2), zorder=1)
-                elif "Violin" in graph_type:
-                    v_parts = ax.violinplot(vals, positions=[pos], widths=bar_width, showextrema=False)
-                    for pc in v_parts['bodies']:
-                        pc.set_facecolor(color); pc.set_edgecolor('black'); pc.set_alpha(0.7); pc.set_zorder(1)
-
-                # Strip Plot Module (Universal Overlay)
-                if show_points:
-                    noise = np.random.normal(0, jitter_strength * bar_width, len(vals))
-                    edge_c = 'gray' if dot_size > 15 else 'none'
-                    ax.scatter(pos + noise, vals, color='white', edgecolor=edge_c, s=dot_size, alpha=dot_alpha, zorder=3)
-
-            # Execution
-            plot_core_internal(ax, pos1, g1, color1)
-            plot_core_internal(ax, pos2, g2, color2)
-
-            # Axis & Tick Integrity
-            tks, lbs = [], []
-            if h_g1: tks.append(pos1); lbs.append(group1_name)
-            if h_g2: tks.append(pos2); lbs.append(group2_name)
-            ax.set_xticks(tks)
-            ax.set_xticklabels(lbs, fontsize=11)
-            ax.set_title(data['name'], fontsize=12, pad=12)
-            ax.set_ylim(0, y_max_limit)
-
-            # Significance Bracket Module (Dynamic adjustment)
-            if data['sig']:
-                c_max = max([max(g1) if h_g1 else 0, max(g2) if h_g2 else 0])
-                y_bracket = c_max * 1.15
-                bracket_h = c_max * 0.03
-                lx_s, lx_e = (pos1, pos2) if h_g1 and h_g2 else (pos1-0.2, pos1+0.2)
-                ax.plot([lx_s, lx_s, lx_e, lx_e], [y_bracket-bracket_h, y_bracket, y_bracket, y_bracket-bracket_h], lw=1.5, c='k')
-                ax.text((lx_s+lx_e)/2, y_bracket + c_max*0.02, data['sig'], ha='center', va='bottom', fontsize=14)
-
-            # Spines & Border Styling (The "Perfect" Look)
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.spines['bottom'].set_linewidth(1.5)
-            ax.spines['bottom'].set_visible(True)  # 必ず表示
-            ax.spines['bottom'].set_color('black') # 色を黒に固定
-            if i == 0:
-                ax.set_ylabel(y_axis_label, fontsize=14)
-                ax.spines['left'].set_linewidth(1.2)
-            else:
-                ax.spines['left'].set_visible(False)
-                ax.tick_params(axis='y', left=False)
-            if i > 0:
-                ax.spines['left'].set_visible(False)
-                ax.tick_params(axis='y', left=False)
-
-            # Dynamic Camera Limit to prevent element clipping
-            view_margin = 0.5
-            edge_coord = (bar_width/2 + bar_gap/2) + bar_width/2
-            ax.set_xlim(-(edge_coord + view_margin), (edge_coord + view_margin))
-
-        # Legend Module
-        if show_legend:
-            lh = []
-            if has_any_g1: lh.append(mpatches.Patch(facecolor=color1, edgecolor='black', label=group1_name))
-            if has_any_g2: lh.append(mpatches.Patch(facecolor=color2, edgecolor='black', label=group2_name))
-            if lh: fig.legend(handles=lh, loc='center left', bbox_to_anchor=(0.93, 0.5), frameon=False, fontsize=12)
-
-        st.pyplot(fig)
-
-        # Professional Export with JST Timestamp
-        img_buf = io.BytesIO()
-        fig.savefig(img_buf, format='png', bbox_inches='tight', dpi=300)
+        # Input snapshot (build_figure cache key)
+        cond_data_tuple = tuple((d['name'], np.asarray(d['g1'], dtype=np.float32), np.asarray(d['g2'], dtype=np.float32), d['sig'])
+                                for d in cond_data_list)
+        style = dict(style, bar_width=bar_width, bar_gap=bar_gap, cap_size=cap_size, fig_height=fig_height,
+                     show_points=show_points, dot_size=dot_size, dot_alpha=dot_alpha, jitter=jitter_strength)
+        # Neutralise settings the current figure ignores, so changing them still hits the cache
+        if "Bar" not in style['graph_type']:
+            style['cap_size'] = 0.0
+        if not style['show_points']:
+            style.update(dot_size=0, dot_alpha=0.0, jitter=0.0)
+
+        # Input signature: skip the render when nothing changed
+        h = hashlib.sha1(repr((tuple((n, len(a), len(b), sg) for n, a, b, sg in cond_data_tuple),
+                               sorted(style.items()), seed, PREVIEW_DPI)).encode())
+        for _, a, b, _ in cond_data_tuple:
+            h.update(a.tobytes()); h.update(b.tobytes())
+        sig = h.hexdigest()
+        stale = st.session_state.get('last_sig') != sig
+        if stale and (auto_update or render_now or 'last_png' not in st.session_state):
+            st.session_state['last_png'] = build_figure(cond_data_tuple, style, seed, PREVIEW_DPI)
+            st.session_state['last_sig'] = sig
+            st.session_state['last_inputs'] = (cond_data_tuple, style, seed)  # what the preview shows
+        elif stale:
+            st.caption("Settings changed: click **Render Preview** to update the figure.")
+        st.image(st.session_state['last_png'])
+
+        # Professional Export with JST Timestamp (encoded on click, from the displayed preview's inputs)
+        shown_data, shown_style, shown_seed = st.session_state['last_inputs']
         now_jst = datetime.datetime.now() + datetime.timedelta(hours=9)
-        st.download_button("📥 Download Publication Quality Image", data=img_buf, 
-                           file_name=f"sci_graph_{now_jst.strftime('%Y%m%d_%H%M%S')}.png", mime="image/png")
+        st.download_button("📥 Download Publication Quality Image (300 DPI)",
+                           data=lambda: build_figure(shown_data, shown_style, shown_seed, EXPORT_DPI),
+                           file_name=f"sci_graph_{now_jst.strftime('%Y%m%d_%H%M%S')}.png", mime="image/png",
+                           on_click="ignore")
 
     except Exception as e:
         st.error(f"Visualization Error: {e}")
-else:
-    st.info("Awaiting input: Please upload a CSV or enter data manually to generate the figure.")
+
+render_section(cond_data_list, dict(graph_type=graph_type, error_type=error_type, labels=(group1_name, group2_name),
+                                    colors=(color1, color2), show_legend=show_legend, y_max=manual_y_max,
+                                    title=fig_title, ylabel=y_axis_label))
@@ -0,0 +1,187 @@
+import matplotlib
+import matplotlib.patches as mpatches
+from matplotlib.artist import setp
+from matplotlib.collections import LineCollection, PolyCollection
+import numpy as np
+from scipy.stats import gaussian_kde
+from stats_kernels import summarize
+
+# Rendering pipeline shared by the Streamlit front end: draws onto caller-supplied Figure/Axes
+matplotlib.rcParams.update({'path.simplify': True, 'path.simplify_threshold': 1.0,
+                            'agg.path.chunksize': 10000, 'text.usetex': False,
+                            'font.family': 'sans-serif', 'font.sans-serif': ['DejaVu Sans'], 'pdf.fonttype': 42,
+                            'axes.spines.top': False, 'axes.spines.right': False})  # open frame, applied when Axes are created
+
+MARKER_LINE_MIN_N = 200  # above this many points per panel, dots are drawn as one Line2D marker run
+PANEL_WIDTH = 3.5  # inches per condition panel
+EDGE_PAD = 0.1  # inches kept clear at the left/right canvas edges
+LEGEND_FONTSIZE = 12
+
+
+def size_canvas(fig, n_panels, height, extra_w=0.0):
+    # Canvas = panel strip + extra_w (legend strip); the constrained-layout rect keeps EDGE_PAD at the sides
+    w = n_panels * PANEL_WIDTH + extra_w
+    fig.set_size_inches(w, height)
+    fig.get_layout_engine().set(rect=(EDGE_PAD / w, 0, 1 - 2 * EDGE_PAD / w, 1))
+
+
+def fast_box(ax, positions, groups, width, colors, quartiles):
+    # Box plots from NumPy primitives (Tukey 1.5 IQR whiskers, no fliers) instead of ax.boxplot;
+    # all boxes of an axis share one bar call, one vlines call and two hlines calls
+    q1, med, q3 = np.asarray(quartiles, dtype=float).T
+    iqr = q3 - q1
+    lo, hi = q1.copy(), q3.copy()
+    for k, vals in enumerate(groups):
+        inside = vals[(vals >= q1[k] - 1.5 * iqr[k]) & (vals <= q3[k] + 1.5 * iqr[k])]
+        if len(inside):  # whiskers never end inside the box (as in cbook.boxplot_stats)
+            lo[k], hi[k] = min(inside.min(), q1[k]), max(inside.max(), q3[k])
+    half, cap = width / 2, width / 4
+    ax.bar(positions, iqr, width=width, bottom=q1, color=colors, edgecolor='black', linewidth=1.2, zorder=1)
+    ax.vlines(np.r_[positions, positions], np.r_[q3, lo], np.r_[hi, q1], colors='black', linewidth=1.2, zorder=1)
+    ax.hlines(np.r_[lo, hi], np.r_[positions, positions] - cap, np.r_[positions, positions] + cap,
+              colors='black', linewidth=1.2, zorder=1)
+    ax.hlines(med, positions - half, positions + half, colors='black', linewidth=1.5, zorder=2)
+
+
+VIOLIN_POINTS = 100  # KDE samples per violin, spread over the group's own min..max (as ax.violinplot does)
+
+
+def violin_outline(pos, vals, width):
+    # Closed KDE outline spanning exactly the data range (None when the KDE is undefined)
+    if len(vals) < 2 or np.ptp(vals) == 0:  # KDE is undefined for a single distinct value
+        return None
+    y = np.linspace(vals.min(), vals.max(), VIOLIN_POINTS)
+    d = gaussian_kde(vals)(y)
+    d *= (width / 2) / d.max()
+    return np.column_stack([np.r_[pos - d, (pos + d)[::-1]], np.r_[y, y[::-1]]])
+
+
+def render(fig, axes, data, style, seed, legend_handles=None):
+    # data: tuple of (name, g1_values, g2_values, significance) per condition
+    # legend_handles: optional pair of Patches to restyle and reuse instead of building new ones
+    graph_type, error_type = style['graph_type'], style['error_type']
+    group1_name, group2_name = style['labels']
+    color1, color2 = style['colors']
+    bar_width, bar_gap, cap_size = style['bar_width'], style['bar_gap'], style['cap_size']
+    show_points, dot_size, dot_alpha, jitter = style['show_points'], style['dot_size'], style['dot_alpha'], style['jitter']
+    y_max, title, ylabel, show_legend = style['y_max'], style['title'], style['ylabel'], style['show_legend']
+
+    n_plots = len(data)
+    fig.suptitle(title, fontsize=16)
+
+    # Summary Statistics: one kernel call over a NaN-padded (condition, group, value) array
+    maxlen = max([len(v) for _, d_g1, d_g2, _ in data for v in (d_g1, d_g2)] + [1])
+    arr = np.full((n_plots, 2, maxlen), np.nan, dtype=np.float32)
+    for i, (_, d_g1, d_g2, _) in enumerate(data):
+        arr[i, 0, :len(d_g1)] = d_g1
+        arr[i, 1, :len(d_g2)] = d_g2
+    ns = np.array([[len(d_g1), len(d_g2)] for _, d_g1, d_g2, _ in data], dtype=np.int64)
+    means, stds, sems, five_num = summarize(arr, ns)
+
+    # Global scale calculation: per-condition maxima straight from the summary (empty groups masked out)
+    condition_maxes = np.where(ns > 0, five_num[:, :, 4], -np.inf).max(axis=1)
+    has_any_g1, has_any_g2 = (ns > 0).any(axis=0)
+    y_max_limit = y_max if y_max > 0 else (float(condition_maxes.max()) * 1.35 if n_plots else 100)
+
+    # Jitter Pool: one batched, pre-scaled draw for every point in the figure, sliced per group
+    # (skipped entirely when points are hidden; group sizes come from the same counts as the stats)
+    total_n = int(ns.sum())
+    jitter_pool = np.random.default_rng(seed).normal(0, jitter * bar_width, total_n) if show_points else np.zeros(total_n)
+    offset = 0
+
+    # Panel extent shared by every axis
+    view_margin = 0.5
+    edge_coord = (bar_width/2 + bar_gap/2) + bar_width/2
+
+    # Rendering Loop
+    for i, ax in enumerate(axes):
+        name, d_g1, d_g2, sig = data[i]
+        g1, g2 = np.array(d_g1, dtype=np.float32), np.array(d_g2, dtype=np.float32)
+        h_g1, h_g2 = len(g1) > 0, len(g2) > 0
+        
+        # Linking element_width and bar_gap to coordinate mapping
+        pos1, pos2 = (-(bar_width/2 + bar_gap/2), +(bar_width/2 + bar_gap/2)) if h_g1 and h_g2 else (0, 0)
+
+        # Geometry Branching: every group of the axis goes through one batched call per element type
+        present = [g for g, h in ((0, h_g1), (1, h_g2)) if h]
+        positions = np.array([pos1, pos2])[present]
+        colors = [(color1, color2)[g] for g in present]
+        if "Bar" in graph_type:
+            heights = means[i, present]
+            errs = (sems if "SEM" in error_type else stds)[i, present]
+            ax.bar(positions, heights, width=bar_width, color=colors, edgecolor='black', linewidth=1.2, zorder=1)
+            ax.errorbar(positions, heights, yerr=errs, fmt='none', color='black', capsize=cap_size, elinewidth=1.5, zorder=2)
+        elif "Box" in graph_type:
+            fast_box(ax, positions, [(g1, g2)[g] for g in present], bar_width, colors, five_num[i, present, 1:4])
+        elif "Violin" in graph_type:
+            outlines = [(violin_outline(pos, (g1, g2)[g], bar_width), c) for pos, g, c in zip(positions, present, colors)]
+            outlines = [(o, c) for o, c in outlines if o is not None]
+            if outlines:
+                ax.add_collection(PolyCollection([o for o, _ in outlines], facecolors=[c for _, c in outlines],
+                                                 edgecolors='black', alpha=0.7, zorder=1), autolim=False)
+
+        # Jitter slices for this axis
+        n1, n2 = ns[i]
+        noise1 = jitter_pool[offset:offset + n1]
+        noise2 = jitter_pool[offset + n1:offset + n1 + n2]
+        offset += n1 + n2
+
+        # Strip Plot Module (Universal Overlay): both groups in one artist
+        if show_points and (h_g1 or h_g2):
+            edge_c = 'gray' if dot_size > 15 else 'none'
+            xs = np.concatenate([pos1 + noise1, pos2 + noise2])
+            ys = np.concatenate([g1, g2])
+            if len(ys) > MARKER_LINE_MIN_N:
+                # Uniform dots: Agg stamps one cached marker glyph instead of a PathCollection's per-point paths
+                # (markersize is the diameter, scatter's s the area; edge width matches scatter's default)
+                ax.plot(xs, ys, 'o', markersize=np.sqrt(dot_size), markerfacecolor='white', markeredgecolor=edge_c,
+                        markeredgewidth=matplotlib.rcParams['lines.linewidth'], alpha=dot_alpha, linestyle='none', zorder=3)
+            else:
+                ax.scatter(xs, ys, color='white', edgecolor=edge_c, s=dot_size, alpha=dot_alpha, zorder=3)
+
+        # Axis & Tick Integrity
+        tks, lbs = [], []
+        if h_g1: tks.append(pos1); lbs.append(group1_name)
+        if h_g2: tks.append(pos2); lbs.append(group2_name)
+        ax.set_xticks(tks)
+        ax.set_xticklabels(lbs, fontsize=11)
+        ax.set_title(name, fontsize=12, pad=12)
+
+        # Significance Bracket Module (Dynamic adjustment)
+        if sig:
+            c_max = condition_maxes[i]
+            y_bracket = c_max * 1.15
+            bracket_h = c_max * 0.03
+            lx_s, lx_e = (pos1, pos2) if h_g1 and h_g2 else (pos1-0.2, pos1+0.2)
+            # Added as a bare collection: skips plot()'s argument parsing, colour cycling and autoscaling
+            bracket = [(lx_s, y_bracket-bracket_h), (lx_s, y_bracket), (lx_e, y_bracket), (lx_e, y_bracket-bracket_h)]
+            ax.add_collection(LineCollection([bracket], linewidths=1.5, colors='k', capstyle='projecting'), autolim=False)
+            ax.text((lx_s+lx_e)/2, y_bracket + c_max*0.02, sig, ha='center', va='bottom', fontsize=14)
+
+    # Spines & Border Styling (The "Perfect" Look)
+    for ax in axes:
+        ax.spines['bottom'].set_linewidth(1.5)
+        ax.spines['bottom'].set_visible(True)  # 必ず表示
+        ax.spines['bottom'].set_color('black') # 色を黒に固定
+    axes[0].set_ylabel(ylabel, fontsize=14)
+    axes[0].spines['left'].set_linewidth(1.2)
+    for ax in axes[1:]:
+        ax.spines['left'].set_visible(False)
+        ax.tick_params(axis='y', left=False, labelleft=False)
+
+    # Dynamic Camera Limit to prevent element clipping (identical for every panel)
+    setp(axes, xlim=(-(edge_coord + view_margin), edge_coord + view_margin), ylim=(0, y_max_limit))
+
+    # Legend Module
+    if show_legend:
+        h1, h2 = legend_handles or (mpatches.Patch(edgecolor='black'), mpatches.Patch(edgecolor='black'))
+        h1.set_facecolor(color1); h1.set_label(group1_name)
+        h2.set_facecolor(color2); h2.set_label(group2_name)
+        lh = [h for h, present in ((h1, has_any_g1), (h2, has_any_g2)) if present]
+        if lh:
+            lg = fig.legend(handles=lh, loc='outside right center', frameon=False, fontsize=LEGEND_FONTSIZE)
+            # Widen the canvas by the legend's measured width so it doesn't take space from the panels
+            legend_w = lg.get_window_extent(fig.canvas.get_renderer()).width / fig.dpi
+            size_canvas(fig, n_plots, fig.get_figheight(), legend_w + lg.borderaxespad * LEGEND_FONTSIZE / 72)
+
+    return fig
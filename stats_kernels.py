@@ -0,0 +1,68 @@
+import numpy as np
+
+# Numba is optional: with it the summary kernel is JIT-compiled (and cached on disk),
+# without it the same results come from vectorized NumPy reductions.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+PERCENTILES = (0.0, 0.25, 0.5, 0.75, 1.0)  # min, Q1, median, Q3, max
+
+
+def _mean_std(a):
+    # Welford's online mean/variance: one pass, no temporaries, numerically stable (SD uses ddof=1)
+    n = a.shape[0]
+    if n == 0:
+        return 0.0, 0.0
+    m, m2 = 0.0, 0.0
+    for k in range(n):
+        d = a[k] - m
+        m += d / (k + 1)
+        m2 += d * (a[k] - m)
+    if n < 2:
+        return m, 0.0
+    return m, (m2 / (n - 1)) ** 0.5
+
+
+mean_std = njit(cache=True, fastmath=True)(_mean_std) if njit else _mean_std
+
+
+def _summarize_loops(arr, ns):
+    # arr: (conditions, groups, maxlen) with the first ns[c, g] slots of each row filled
+    n_cond, n_grp = arr.shape[0], arr.shape[1]
+    means = np.zeros((n_cond, n_grp))
+    stds = np.zeros((n_cond, n_grp))
+    sems = np.zeros((n_cond, n_grp))
+    five_num = np.zeros((n_cond, n_grp, 5))
+    for c in range(n_cond):
+        for g in range(n_grp):
+            n = ns[c, g]
+            if n == 0:
+                continue
+            means[c, g], stds[c, g] = mean_std(arr[c, g, :n])
+            sems[c, g] = stds[c, g] / np.sqrt(n)
+            # Linear-interpolated percentiles (same convention as np.percentile)
+            srt = np.sort(arr[c, g, :n])
+            for j in range(5):
+                h = (n - 1) * PERCENTILES[j]
+                lo = int(np.floor(h))
+                hi = min(lo + 1, n - 1)
+                five_num[c, g, j] = srt[lo] + (h - lo) * (srt[hi] - srt[lo])
+    return means, stds, sems, five_num
+
+
+def _summarize_numpy(arr, ns):
+    # nansum/count reductions; percentiles only for non-empty rows
+    vals = arr.astype(np.float64)
+    means = np.nansum(vals, axis=2) / np.maximum(ns, 1)
+    ss = np.nansum((vals - means[:, :, None]) ** 2, axis=2)
+    stds = np.where(ns > 1, np.sqrt(ss / np.maximum(ns - 1, 1)), 0.0)
+    sems = stds / np.sqrt(np.maximum(ns, 1))
+    five_num = np.zeros(ns.shape + (len(PERCENTILES),))
+    filled = ns > 0  # percentiles only for rows holding at least one value
+    five_num[filled] = np.nanpercentile(vals[filled], [p * 100 for p in PERCENTILES], axis=1).T
+    return means, stds, sems, five_num
+
+
+summarize = njit(cache=True, fastmath=True)(_summarize_loops) if njit else _summarize_numpy
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from matplotlib import cbook
+from matplotlib.figure import Figure
+
+from plot_engine import fast_box, render, size_canvas
+
+# fast_box replaces ax.boxplot, so its whisker ends must match Matplotlib's own boxplot_stats,
+# including skewed groups where no value lies between a quartile and its 1.5 IQR fence
+GROUPS = [
+    np.array([1.0, 2.0, 3.0, 50.0]),
+    np.array([-50.0, 1.0, 2.0, 3.0]),
+    np.array([98.0, 100.0, 102.0, 105.0, 101.5]),
+]
+
+
+@pytest.mark.parametrize('vals', GROUPS, ids=lambda v: ' '.join(f'{x:g}' for x in v))
+def test_whiskers_match_boxplot_stats(vals):
+    ax = Figure().add_subplot()
+    fast_box(ax, np.array([0.0]), [vals], 0.6, ['#999999'], [np.percentile(vals, [25, 50, 75])])
+    caps = ax.collections[1].get_segments()  # whisker caps: low end, then high end
+    stats = cbook.boxplot_stats(vals)[0]
+    np.testing.assert_allclose([caps[0][0, 1], caps[1][0, 1]], [stats['whislo'], stats['whishi']])
+
+
+def single_panel(labels):
+    # Same Figure setup as app.get_fig, one condition, legend shown
+    fig = Figure(layout='constrained')
+    fig.get_layout_engine().set(w_pad=0, wspace=0)
+    size_canvas(fig, 1, 5.0)
+    axes = list(fig.subplots(1, 1, squeeze=False)[0])
+    style = dict(graph_type='Bar Plot (Mean)', error_type='SD (Standard Deviation)', labels=labels,
+                 colors=('#999999', '#66c2a5'), bar_width=0.6, bar_gap=0.05, cap_size=5.0, show_points=True,
+                 dot_size=20, dot_alpha=0.6, jitter=0.04, y_max=0.0, title='Experimental Result',
+                 ylabel='Relative Intensity (%)', show_legend=True)
+    data = (('DMSO', np.array([100, 105, 98, 102], np.float32), np.array([80, 75, 85, 82], np.float32), ''),)
+    render(fig, axes, data, style, 42)
+    fig.canvas.draw()
+    return fig, axes[0]
+
+
+@pytest.mark.parametrize('labels', [('Control', 'Target'), ('Vehicle (0.1% DMSO)', 'siRNA knockdown #2')])
+def test_legend_does_not_squeeze_panel(labels):
+    # The outside legend widens the canvas instead of taking its width from the panel
+    fig, ax = single_panel(labels)
+    assert ax.get_position().width * fig.get_figwidth() > 2.2
+    assert fig.legends[0].get_window_extent().x0 >= ax.get_window_extent().x1
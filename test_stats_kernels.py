@@ -0,0 +1,64 @@
+import warnings
+
+import numpy as np
+import pytest
+
+import stats_kernels
+from stats_kernels import PERCENTILES, _summarize_loops, _summarize_numpy
+
+# Both summary paths (loop kernel, used JIT-compiled when Numba is present, and the NumPy fallback)
+# must agree with NumPy's own reductions, including empty and single-value groups
+GROUPS = [
+    [[98.0, 100.0, 102.0, 105.0, 101.5], []],
+    [[55.0], [30.0, 35.0, 28.0, 40.0]],
+    [[], [7.25, 7.5]],
+]
+
+IMPLEMENTATIONS = [_summarize_loops, _summarize_numpy]
+if stats_kernels.summarize not in IMPLEMENTATIONS:
+    IMPLEMENTATIONS.append(stats_kernels.summarize)  # the njit-compiled kernel
+
+
+def padded(groups):
+    maxlen = max(len(v) for row in groups for v in row)
+    arr = np.full((len(groups), 2, maxlen), np.nan, dtype=np.float32)
+    for c, row in enumerate(groups):
+        for g, v in enumerate(row):
+            arr[c, g, :len(v)] = v
+    ns = np.array([[len(v) for v in row] for row in groups], dtype=np.int64)
+    return arr, ns
+
+
+def expected(v):
+    v = np.asarray(v, dtype=np.float32).astype(np.float64)
+    if len(v) == 0:
+        return 0.0, 0.0, 0.0, np.zeros(5)
+    sd = np.std(v, ddof=1) if len(v) > 1 else 0.0
+    return np.mean(v), sd, sd / np.sqrt(len(v)), np.percentile(v, [p * 100 for p in PERCENTILES])
+
+
+@pytest.mark.parametrize('summarize', IMPLEMENTATIONS, ids=lambda f: f.__name__)
+def test_summarize_matches_numpy(summarize):
+    arr, ns = padded(GROUPS)
+    means, stds, sems, five_num = summarize(arr, ns)
+    for c, row in enumerate(GROUPS):
+        for g, v in enumerate(row):
+            m, sd, se, q = expected(v)
+            np.testing.assert_allclose(means[c, g], m, rtol=1e-6, atol=1e-9)
+            np.testing.assert_allclose(stds[c, g], sd, rtol=1e-5, atol=1e-9)
+            np.testing.assert_allclose(sems[c, g], se, rtol=1e-5, atol=1e-9)
+            np.testing.assert_allclose(five_num[c, g], q, rtol=1e-6, atol=1e-9)
+
+
+def test_paths_agree():
+    arr, ns = padded(GROUPS)
+    for a, b in zip(_summarize_loops(arr, ns), _summarize_numpy(arr, ns)):
+        np.testing.assert_allclose(a, b, rtol=1e-5, atol=1e-9)
+
+
+def test_numpy_path_does_not_warn():
+    # Empty and single-value groups must not emit RuntimeWarnings (nothing may rely on warning filters)
+    arr, ns = padded(GROUPS)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        _summarize_numpy(arr, ns)